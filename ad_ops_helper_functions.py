@@ -1,8 +1,51 @@
 ### Helper functions to automate ad operations tasks.
+import logging
+
 import numpy as np
 import pandas as pd
 
-def generate_new_csv(df, csv=str, name=None):
+logger = logging.getLogger(__name__)
+
+# Every Unicode whitespace character, i.e. the characters for which `str.isspace()`
+# is true and that `\s` matches in `str` patterns, including NBSP and thin spaces.
+_WHITESPACE_CHARS = (
+  '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680'
+  '\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a'
+  '\u2028\u2029\u202f\u205f\u3000'
+)
+# Characters stripped from budget strings before numeric conversion: whitespace,
+# dollar signs and commas. Hyphens are stripped separately so that a leading
+# minus sign survives.
+_BUDGET_CHARS = _WHITESPACE_CHARS + '$,'
+_BUDGET_TRANS = str.maketrans('', '', _BUDGET_CHARS)
+# Character class matching exactly `_BUDGET_CHARS`, used on Arrow-backed string
+# columns. The characters are listed literally rather than via `\s`, whose RE2
+# meaning (ASCII only, no `\v`) differs from Python's.
+# Kept as a plain string: pandas only hands string patterns to Arrow's RE2
+# kernel and falls back to per-element `re` for compiled `re.Pattern` objects.
+_BUDGET_PATTERN = '[' + ''.join('\\' + c if c in '\\]^-' else c for c in _BUDGET_CHARS) + ']'
+
+# Flight columns kept by `map_creative_name_to_flights`, in output order.
+_FLIGHT_COLUMNS = ('Flight ID',
+                   'Target Name',
+                   'Target ID',
+                   'Ad Name',
+                   'Package Name',
+                   'Ad ID',
+                   'Target Type',
+                   'Ad Type',
+                   'Ad Type Name',
+                   'Ad Unit',
+                   'Ad Unit Name',
+                   'Ad Dimensions',
+                   'Start Date',
+                   'End Date',
+                   'Run Time',
+                   'Budget',
+                   'Paused',
+                   'Completed')
+
+def generate_new_csv(df, csv=str, name=None, engine=None):
   """
   Generates a new CSV file with a modified filename.
 
@@ -10,6 +53,9 @@ def generate_new_csv(df, csv=str, name=None):
       df (pd.DataFrame): The DataFrame to be saved as a CSV file.
       csv (str): The original CSV filename.
       name (str, optional): The string to be inserted into the filename at position 9.
+      engine (str, optional): Pass `'pyarrow'` to write the file with Arrow's C++ CSV writer (requires `pyarrow`),
+          which is much faster than `DataFrame.to_csv` on large DataFrames. Its output quotes header names
+          and strings, writes booleans as `true`/`false` and drops the trailing `.0` from whole floats.
 
   Returns:
       None: The function saves the DataFrame as a CSV file with the updated filename.
@@ -19,27 +65,52 @@ def generate_new_csv(df, csv=str, name=None):
   """
   updated_file_name = csv[:9] + name + csv[9:]
 
+  if engine == 'pyarrow':
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    return pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), updated_file_name)
+
   return df.to_csv(updated_file_name, index=False)
 
-def get_dataframes_from_csv_files(csv1, csv2):
+def _read_csv(csv, engine):
+  """
+  Reads a CSV file with `pd.read_csv`, turning the `datetime.date` values the pyarrow engine
+  infers for ISO dates back into their original `YYYY-MM-DD` strings.
+  """
+  df = pd.read_csv(csv, engine=engine)
+
+  if engine == 'pyarrow':
+    for column in df.columns[(df.dtypes == object).to_numpy()]:
+      if pd.api.types.infer_dtype(df[column], skipna=True) == 'date':
+        df[column] = df[column].map(lambda value: value.isoformat(), na_action='ignore')
+
+  return df
+
+def get_dataframes_from_csv_files(csv1, csv2, engine=None):
   """
   Reads two CSV files and returns their corresponding pandas DataFrames.
 
   Args:
       csv1 (str): Path to the first CSV file.
       csv2 (str): Path to the second CSV file.
+      engine (str, optional): The `pd.read_csv` parser engine. Pass `'pyarrow'` to parse large files
+          with Arrow's multithreaded reader (requires `pyarrow`). Columns that Arrow parses as dates,
+          such as a `Start Date` of `2024-01-01`, are converted back to the same `YYYY-MM-DD` strings
+          the default engine returns, so `update_budgets` still matches them; ISO timestamps are
+          returned as datetime64 columns, which `update_budgets` also matches against date strings.
 
   Returns:
       tuple: A tuple containing two pandas DataFrames (df1, df2) corresponding to csv1 and csv2.
 
-  Prints:
+  Logs (at DEBUG level):
       - The number of rows and columns in each CSV file.
   """
-  df1 = pd.read_csv(csv1)
-  df2 = pd.read_csv(csv2)
+  df1 = _read_csv(csv1, engine)
+  df2 = _read_csv(csv2, engine)
 
-  print(f'CSV1 has {df1.shape[0]} rows and {df1.shape[1]} columns.')
-  print(f'CSV2 has {df2.shape[0]} rows and {df2.shape[1]} columns.')
+  logger.debug('CSV1 has %d rows and %d columns.', df1.shape[0], df1.shape[1])
+  logger.debug('CSV2 has %d rows and %d columns.', df2.shape[0], df2.shape[1])
 
   return df1, df2
 
@@ -55,48 +126,27 @@ def map_creative_name_to_flights(df1, df2, column_to_merge_on):
   Returns:
       pd.DataFrame: A new DataFrame with a 'Creative Name' columns after merging df1 and df2.
 
-  Prints:
-      - The final column names of the resulting DataFrame after selection and renaming.
+  Logs (at DEBUG level):
+      - The final column names of the resulting DataFrame after selection.
 
   The function performs the following operations:
-      1. Merges `df1` and `df2` using a left join on `column_to_merge_on`, 
-          adding suffixes `_actual` and `_prediction` to overlapping column names.
-      2. Selects a predefined subset of columns from the merged DataFrame.
-      3. Renames specific columns by removing the `_actual` suffix.
-      4. Prints the final column names before returning the modified DataFrame.
+      1. Projects `df1` down to the flight columns it contains, and `df2` down to `column_to_merge_on`,
+         `Creative Name` and the flight columns missing from `df1`, so only the needed columns are
+         hashed and copied by the merge. Flight columns present in both DataFrames are taken from `df1`.
+      2. Merges the projected DataFrames using a left join on `column_to_merge_on`.
+      3. Selects the flight columns followed by `Creative Name` from the merged DataFrame.
+      4. Logs the final column names before returning the modified DataFrame.
   """
-  temp_df = pd.merge(df1, df2, on=[column_to_merge_on], how='left', suffixes=('_actual', '_prediction'))
-
-  temp_columns = ['Flight ID',
-                 'Target Name',
-                 'Target ID',
-                 'Ad Name_actual',
-                 'Package Name_actual',
-                 'Ad ID',
-                 'Target Type',
-                 'Ad Type_actual',
-                 'Ad Type Name',
-                 'Ad Unit_actual',
-                 'Ad Unit Name',
-                 'Ad Dimensions',
-                 'Start Date',
-                 'End Date',
-                 'Run Time',
-                 'Budget',
-                 'Paused',
-                 'Completed',
-                 'Creative Name']
-
-  temp_df = temp_df[temp_columns].copy()
-
-  temp_df = temp_df.rename(columns={
-    'Ad Name_actual': 'Ad Name',
-    'Package Name_actual': 'Package Name',
-    'Ad Type_actual': 'Ad Type',
-    'Ad Unit_actual': 'Ad Unit'
-  })
-
-  print(f'Column names: {temp_df.columns.to_list()}')
+  flight_columns = [column for column in _FLIGHT_COLUMNS if column in df1.columns]
+  missing_columns = [column for column in _FLIGHT_COLUMNS if column not in df1.columns and column in df2.columns]
+
+  flights = df1[list(dict.fromkeys(flight_columns + [column_to_merge_on]))]
+  creatives = df2[list(dict.fromkeys([column_to_merge_on, 'Creative Name'] + missing_columns))]
+  temp_df = pd.merge(flights, creatives, on=[column_to_merge_on], how='left')
+
+  temp_df = temp_df[[*_FLIGHT_COLUMNS, 'Creative Name']]
+
+  logger.debug('Column names: %s', temp_df.columns.to_list())
   return temp_df
 
 def update_column_names(df, column_names, new_column_names):
@@ -117,6 +167,13 @@ def update_column_names(df, column_names, new_column_names):
   rename_mapping = dict(zip(column_names, new_column_names))
   return df.rename(columns=rename_mapping)
 
+def _clean_budget_string(value):
+  """
+  Strips `_BUDGET_CHARS` and every hyphen except a leading minus sign from a budget string.
+  """
+  value = value.translate(_BUDGET_TRANS)
+  return value[:1] + value[1:].replace('-', '')
+
 def clean_and_convert_budgets(df, columns_to_process):
   """
   Cleans and converts specified budget columns in a DataFrame to numeric format.
@@ -129,60 +186,79 @@ def clean_and_convert_budgets(df, columns_to_process):
       pd.DataFrame: The DataFrame with specified columns converted to numeric values.
 
   The function performs the following operations on each column in `columns_to_process`:
-      1. Removes whitespace, dollar signs (`$`), commas (`,`), and hyphens (`-`) from the values.
-      2. Converts the cleaned strings to numeric values, coercing errors to NaN.
-  """
-  for column in columns_to_process:
-    df[column] = df[column].str.replace(r'[\s\$-,]', '', regex=True)
-    df[column] = pd.to_numeric(df[column], errors='coerce')
-
-  return df
-
-def create_new_budget_columns(df, columns_to_process):
-  """
-  Creates new budget-related columns in the DataFrame.
-
-  Args:
-      df (pd.DataFrame): The DataFrame containing budget columns to be processed.
-      columns_to_process (list of str): A list of column names for which new columns will be created.
-
-  Returns:
-      pd.DataFrame: The DataFrame with new columns added.
-
-  The function performs the following operations for each column in `columns_to_process`:
-      1. Creates a new column `Header_<col>` that stores the original column name as its value.
-      2. Creates a new column `Values_<col>` that stores the original column values.
+      1. Removes whitespace, dollar signs (`$`), commas (`,`), and hyphens (`-`) from the values,
+         except a hyphen left at the start once the other characters are removed, which is kept as
+         a minus sign (e.g. `'-$300'` becomes `-300`).
+         Arrow-backed string columns (e.g. `string[pyarrow]`) are cleaned with Arrow's string kernels;
+         all other columns are stacked into one array and cleaned in a single `str.translate` pass,
+         leaving non-string values untouched.
+      2. Converts the cleaned strings to numeric values column by column, coercing errors to NaN.
   """
-  for col in columns_to_process:
-    df[f'Header_{col}'] = col
-    df[f'Values_{col}'] = df[col]
+  arrow_columns = [
+    column for column in columns_to_process
+    if isinstance(df[column].dtype, pd.StringDtype) and df[column].dtype.storage == 'pyarrow'
+  ]
+  other_columns = [column for column in columns_to_process if column not in arrow_columns]
+
+  for column in arrow_columns:
+    cleaned = df[column].str.replace(_BUDGET_PATTERN, '', regex=True)
+    cleaned = cleaned.str.slice(0, 1) + cleaned.str.slice(1).str.replace('-', '', regex=False)
+    df[column] = pd.to_numeric(cleaned, errors='coerce')
+
+  if other_columns:
+    values = df[other_columns].to_numpy(dtype=object).ravel(order='F')
+    cleaned = np.array(
+        [_clean_budget_string(value) if isinstance(value, str) else value for value in values],
+        dtype=object
+      ).reshape(len(df), len(other_columns), order='F')
+
+    for i, column in enumerate(other_columns):
+      df[column] = pd.to_numeric(cleaned[:, i], errors='coerce')
 
   return df
 
 def process_dataframes(df, column_names, new_column_names, columns_to_process):
   """
-  Processes a DataFrame by renaming columns, cleaning budget data, and creating new budget-related columns.
+  Processes a DataFrame by renaming columns and cleaning budget data.
 
   Args:
       df (pd.DataFrame): The input DataFrame to be processed.
       column_names (list of str): A list of existing column names to be replaced.
       new_column_names (list of str): A list of new column names corresponding to `column_names`.
-      columns_to_process (list of str): A list of columns that need budget cleaning and transformation.
+      columns_to_process (list of str): A list of columns that need budget cleaning.
 
   Returns:
-      pd.DataFrame: The processed DataFrame with renamed columns, cleaned budget values, and additional budget-related columns.
+      pd.DataFrame: The processed DataFrame with renamed columns and cleaned budget values.
 
   The function performs the following steps:
       1. Renames columns in `df` using `update_column_names`.
       2. Cleans and converts budget-related columns to numeric format using `clean_and_convert_budgets`.
-      3. Creates new budget-related columns using `create_new_budget_columns`.
   """
   df = update_column_names(df, column_names, new_column_names)
   df = clean_and_convert_budgets(df, columns_to_process)
-  df = create_new_budget_columns(df, columns_to_process)
 
   return df
 
+def build_budget_index(df, date_columns):
+  """
+  Builds a lookup of total budgets keyed by package and start date.
+
+  Args:
+      df (pd.DataFrame): The DataFrame containing package-level budget data, with one budget column per start date.
+      date_columns (list of str): The start date columns to include in the index.
+
+  Returns:
+      pd.Series: The total budget for each package and start date, indexed by (`Package Name`, `Start Date`).
+
+  The function sums the `date_columns` block for each package in a single groupby, so each
+  start date column is reduced as one contiguous array, and flattens the resulting
+  package-by-date table into a Series.
+  """
+  budgets = df.groupby('Package Name', sort=False)[list(date_columns)].sum()
+  index = pd.MultiIndex.from_product([budgets.index, budgets.columns], names=['Package Name', 'Start Date'])
+
+  return pd.Series(budgets.to_numpy(dtype=float).ravel(), index=index, name='Budget')
+
 def get_num_flights(df, package, start_date):
   """
   Returns the number of flights for a given package and start date.
@@ -205,31 +281,25 @@ def get_num_flights(df, package, start_date):
 
   return num_flights
 
-def get_budget(df, package, start_date):
+def get_budget(budget_index, package, start_date):
   """
-  Calculates the total budget for a given package and start date.
+  Returns the total budget for a given package and start date.
 
   Args:
-      df (pd.DataFrame): The DataFrame containing budget data.
-      package (str): The package name to filter the data.
-      start_date (str): The start date to filter the data.
+      budget_index (pd.Series): The budget lookup returned by `build_budget_index`.
+      package (str): The package name to look up.
+      start_date (str): The start date to look up.
 
   Returns:
-      float or int: The total budget for the specified package and start date.
+      float or int: The total budget for the specified package and start date, or zero if there is none.
 
-  The function constructs dynamic column names (`Header_<start_date>` and `Values_<start_date>`)
-  and filters the DataFrame based on `Package Name` and `Header_<start_date>`. 
-  It then sums the values from the corresponding `Values_<start_date>` column.
+  Raises:
+      TypeError: If `budget_index` is a DataFrame rather than the Series returned by `build_budget_index`.
   """
-  header_start_date = 'Header_' + start_date
-  value_start_date = 'Values_' + start_date
-
-  budget = df.loc[
-    (df['Package Name'] == package) &
-    (df[header_start_date] == start_date), value_start_date
-  ].sum()
+  if isinstance(budget_index, pd.DataFrame):
+    raise TypeError('get_budget expects the Series returned by build_budget_index, not a DataFrame')
 
-  return budget
+  return budget_index.get((package, start_date), 0.0)
 
 def update_flight_level_budgets(df, package, start_date, flight_level_budget):
   """
@@ -245,17 +315,39 @@ def update_flight_level_budgets(df, package, start_date, flight_level_budget):
       pd.DataFrame: The updated DataFrame with modified budget values.
 
   The function locates rows in `df` where `Package Name` matches `package` 
-  and `Start Date` matches `start_date`, then updates the `Budget` column 
-  with `flight_level_budget`.
+  and `Start Date` matches `start_date`, then replaces the `Budget` column in a single
+  assignment with `flight_level_budget` for those rows.
   """
-  df.loc[
+  mask = (
       (df['Package Name'] == package) &
-      (df['Start Date'] == start_date), 'Budget'
-    ] = flight_level_budget
+      (df['Start Date'] == start_date)
+    )
+  df['Budget'] = df['Budget'].where(~mask, flight_level_budget)
 
   return df
 
-def update_budgets(df1, df2, packages_to_process, start_dates):
+def _as_start_dates(start_dates, start_date_column):
+  """
+  Converts start date labels, e.g. the date column names of `df2`, to the dtype of `start_date_column`.
+
+  This mirrors how `start_date_column == start_date` parses a date string when the column is datetime64,
+  so the vectorized lookups in `update_budgets` match the same rows as a direct comparison.
+  """
+  return pd.Index(start_dates).astype(start_date_column.dtype)
+
+def _with_start_dates(budget_index, start_date_column):
+  """
+  Returns `budget_index` with its `Start Date` level converted with `_as_start_dates`.
+  """
+  start_dates = _as_start_dates(budget_index.index.get_level_values('Start Date'), start_date_column)
+  index = pd.MultiIndex.from_arrays(
+      [budget_index.index.get_level_values('Package Name'), start_dates],
+      names=['Package Name', 'Start Date']
+    )
+
+  return budget_index.set_axis(index)
+
+def update_budgets(df1, df2, packages_to_process, start_dates, budget_index=None):
   """
   Updates flight-level budgets based on aggregated package-level budgets.
 
@@ -264,33 +356,55 @@ def update_budgets(df1, df2, packages_to_process, start_dates):
       df2 (pd.DataFrame): The DataFrame containing package-level budget data.
       packages_to_process (list of str): A list of package names to process.
       start_dates (list of str): A list of start dates to process.
+      budget_index (pd.Series, optional): A budget lookup previously returned by `build_budget_index` for `df2`.
+          Pass it when calling the function repeatedly so `df2` is not re-aggregated on every call;
+          it must cover every date in `start_dates`.
 
   Returns:
       pd.DataFrame: The updated `df1` DataFrame with modified flight-level budgets.
 
+  Raises:
+      KeyError: If `budget_index` is given and has no budgets for some of the `start_dates`.
+
   The function performs the following steps:
-      1. Identifies unique packages and start dates from the input lists.
-      2. Iterates through each unique package and start date.
-      3. Retrieves the number of flights (`get_num_flights`) and total budget (`get_budget`) for each package-start date combination.
-      4. Calculates the flight-level budget by dividing the total budget by the number of flights.
-      5. Updates the budget values in `df1` using `update_flight_level_budgets`.
+      1. Identifies unique packages and start dates from the input lists, converting the start dates
+         (and the start dates of the budget index) to the type of `df1['Start Date']`, so that date
+         strings match a datetime `Start Date` column.
+      2. Factorizes the `Package Name` and `Start Date` pairs of `df1` into integer group codes.
+      3. Counts the flights in each group with `np.bincount`.
+      4. Sums the budget in `df2` for each group using `build_budget_index`, unless `budget_index` is given.
+      5. Calculates the flight-level budget by dividing the total budget by the number of flights,
+         leaving groups without flights (including those outside the packages and start dates to process) as NaN.
+      6. Gathers each flight's budget by its group code and updates the `Budget` column in one assignment.
 
   Note:
-      - If `num_flights` is zero, a division by zero error may occur.
-      - Ensure `get_num_flights` and `get_budget` return valid values before performing the division.
+      - Package-start date combinations without any flights in `df1` are skipped, so no division by zero occurs.
+      - Flights whose package has no budget in `df2` receive a budget of zero.
   """
   unique_packages = list(set(packages_to_process))
   unique_start_dates = list(set(start_dates))
-
-  for package in unique_packages:
-    for start_date in unique_start_dates:
-      num_flights = get_num_flights(df1, package, start_date)
-      budget = get_budget(df2, package, start_date)
-
-      if num_flights == 0:
-        continue
-      
-      flight_level_budget = budget / num_flights
-      update_flight_level_budgets(df1, package, start_date, flight_level_budget)
+  keys = ['Package Name', 'Start Date']
+
+  start_date_keys = _as_start_dates(unique_start_dates, df1['Start Date'])
+
+  codes, groups = pd.MultiIndex.from_frame(df1[keys]).factorize()
+  in_scope = (
+      df1['Package Name'].isin(unique_packages) &
+      df1['Start Date'].isin(start_date_keys)
+    ).to_numpy()
+
+  num_flights = np.bincount(codes[in_scope & df1['Budget'].notna().to_numpy()], minlength=len(groups))
+  if budget_index is None:
+    budget_index = _with_start_dates(build_budget_index(df2, unique_start_dates), df1['Start Date'])
+  else:
+    budget_index = _with_start_dates(budget_index, df1['Start Date'])
+    missing_dates = start_date_keys.difference(budget_index.index.get_level_values('Start Date'))
+    if len(missing_dates):
+      raise KeyError(f'budget_index has no budgets for start dates: {missing_dates.tolist()}')
+  budget = budget_index.reindex(groups, fill_value=0).to_numpy(dtype=float)
+
+  flight_level_budget = np.divide(budget, num_flights, out=np.full(len(groups), np.nan), where=num_flights > 0)
+  new_budgets = flight_level_budget[codes]
+  df1['Budget'] = df1['Budget'].where(np.isnan(new_budgets), new_budgets)
 
   return df1
@@ -0,0 +1,80 @@
+import sys
+
+import pandas as pd
+import pytest
+
+import ad_ops_helper_functions as helpers
+
+
+def make_flights(start_dates):
+  return pd.DataFrame({
+    'Package Name': ['A', 'A', 'B'],
+    'Start Date': start_dates,
+    'Budget': [1.0, 2.0, 3.0],
+  })
+
+
+def test_update_budgets_matches_datetime_start_dates():
+  df1 = make_flights(pd.to_datetime(['2024-01-01'] * 3))
+  df2 = pd.DataFrame({'Package Name': ['A'], '2024-01-01': [10.0]})
+
+  result = helpers.update_budgets(df1, df2, ['A'], ['2024-01-01'])
+
+  assert result['Budget'].tolist() == [5.0, 5.0, 3.0]
+
+
+def test_update_budgets_matches_datetime_start_dates_with_budget_index():
+  df1 = make_flights(pd.to_datetime(['2024-01-01'] * 3))
+  df2 = pd.DataFrame({'Package Name': ['A'], '2024-01-01': [10.0]})
+  budget_index = helpers.build_budget_index(df2, ['2024-01-01'])
+
+  result = helpers.update_budgets(df1, df2, ['A'], ['2024-01-01'], budget_index=budget_index)
+
+  assert result['Budget'].tolist() == [5.0, 5.0, 3.0]
+
+  with pytest.raises(KeyError):
+    helpers.update_budgets(df1, df2, ['A'], ['2024-01-01', '2024-02-01'], budget_index=budget_index)
+
+
+def test_update_flight_level_budgets_matches_datetime_start_dates():
+  df = make_flights(pd.to_datetime(['2024-01-01', '2024-02-01', '2024-01-01']))
+
+  result = helpers.update_flight_level_budgets(df, 'A', '2024-01-01', 9.0)
+
+  assert result['Budget'].tolist() == [9.0, 2.0, 3.0]
+
+
+def test_whitespace_chars_match_str_isspace():
+  expected = ''.join(c for c in map(chr, range(sys.maxunicode + 1)) if c.isspace())
+
+  assert helpers._WHITESPACE_CHARS == expected
+
+
+@pytest.mark.parametrize('dtype', [object, 'string[python]', 'string[pyarrow]'])
+def test_clean_and_convert_budgets_keeps_leading_minus_sign(dtype):
+  if dtype == 'string[pyarrow]':
+    pytest.importorskip('pyarrow')
+  values = ['$1,000', '-300', '-$1,000', ' - $5 ', '300-', '1-2', '-', '1\xa0000', '1\x0b2', None]
+  df = pd.DataFrame({'Budget': pd.Series(values, dtype=dtype)})
+
+  result = helpers.clean_and_convert_budgets(df, ['Budget'])
+
+  expected = [1000.0, -300.0, -1000.0, -5.0, 300.0, 12.0, float('nan'), 1000.0, 12.0, float('nan')]
+  assert result['Budget'].astype(float).tolist() == pytest.approx(expected, nan_ok=True)
+
+
+def test_pyarrow_engine_start_dates_match_update_budgets(tmp_path):
+  pytest.importorskip('pyarrow')
+  flights_csv = tmp_path / 'flights.csv'
+  budgets_csv = tmp_path / 'budgets.csv'
+  flights_csv.write_text('Package Name,Start Date,Budget\nA,2024-01-01,1\nA,2024-01-01,2\nB,2024-01-01,3\n')
+  budgets_csv.write_text('Package Name,2024-01-01\nA,"$10"\n')
+
+  df1, df2 = helpers.get_dataframes_from_csv_files(flights_csv, budgets_csv, engine='pyarrow')
+  df2 = helpers.clean_and_convert_budgets(df2, ['2024-01-01'])
+
+  assert df1['Start Date'].tolist() == ['2024-01-01'] * 3
+
+  result = helpers.update_budgets(df1, df2, ['A'], ['2024-01-01'])
+
+  assert result['Budget'].tolist() == [5.0, 5.0, 3.0]